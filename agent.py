@@ -1,9 +1,13 @@
 import os
+import io
 import subprocess
 import re
 import json
 import sys
 import argparse
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from git import Repo
@@ -315,7 +319,8 @@ def plan_changes_with_react(issue_content, file_list, repo_path, codebase_analys
             success, result = tools_executor.execute_tool(tool_name, **args)
             
             if success:
-                formatted_result = tools_executor.format_tool_result(result, max_items=10)
+                formatted_result = tools_executor.format_tool_result(
+                    result, max_items=10, result_cap=tools_executor.result_cap(tool_name, args))
                 exploration_log.append(f"Tool: {tool_name}({args})\nResult:\n{formatted_result}")
                 print(f"Result: {formatted_result[:500]}...")
             else:
@@ -611,6 +616,28 @@ def self_review_changes(issue_content, files_changed, codebase_analysis):
     print("Warning: Review result unclear, treating as approved")
     return True, review_result
 
+def prewarm_sandbox():
+    """
+    Pull the sandbox Docker image ahead of the first test run.
+    
+    Meant to run in the background from startup, so a cold image pull
+    overlaps with indexing, LLM calls and git/GitHub work instead of delaying
+    the first test run. An image that is already present is not pulled again.
+    """
+    docker_image = LANGUAGE_STRATEGY.get_docker_image()
+    try:
+        # Already cached locally: skip the registry round trip (and work offline)
+        if subprocess.run(["docker", "image", "inspect", docker_image],
+                          capture_output=True, timeout=DOCKER_TIMEOUT).returncode == 0:
+            return True
+        subprocess.run(["docker", "pull", "-q", docker_image],
+                       capture_output=True, text=True, timeout=DOCKER_TIMEOUT, check=True)
+        return True
+    except (FileNotFoundError, subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        # Not fatal: docker run will pull (or report the error) itself
+        print(f"Warning: Could not pre-pull {docker_image}: {e}")
+        return False
+
 def run_tests_in_sandbox(repo_path):
     print("\n--- 🔒 STARTING SANDBOXED TEST RUN ---")
     abs_path = os.path.abspath(repo_path)
@@ -643,6 +670,29 @@ def run_tests_in_sandbox(repo_path):
         print(f"Error: Test execution timed out after {DOCKER_TIMEOUT}s")
         return False, "Timeout"
 
+def write_file_atomic(full_path, content):
+    """
+    Write content to a file atomically with LF line endings.
+    
+    Writes to a temporary file in the same directory and swaps it into place
+    with os.replace, so an interrupted write never leaves a truncated file.
+    """
+    if '\r' in content:
+        content = content.replace('\r\n', '\n')
+    
+    dir_path = os.path.dirname(full_path) or '.'
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='\n', dir=dir_path,
+                                     delete=False, buffering=1 << 20) as tf:
+        tf.write(content)
+    try:
+        # NamedTemporaryFile is created 0600; keep the original file's permissions
+        if os.path.exists(full_path):
+            shutil.copymode(full_path, tf.name)
+        os.replace(tf.name, full_path)
+    except OSError:
+        os.unlink(tf.name)
+        raise
+
 def clean_llm_response(text):
     """
     V14 (Restored): Aggressively extracts code from LLM chatter.
@@ -944,8 +994,14 @@ Examples:
         print(f"Error creating branch: {e}")
         sys.exit(1)
     
-    # Initialize PR Manager
+    # Initialize PR Manager, picking up an already open PR for this branch
     pr_manager = PRManager(repo, branch, github_issue_number, REPO_PATH)
+    pr_manager.find_open_pr()
+    
+    # Background worker: pulls the sandbox image while the agent indexes and
+    # edits, then overlaps repair pushes with test runs in Phase 5
+    background = ThreadPoolExecutor(max_workers=1)
+    prewarm_task = background.submit(prewarm_sandbox) if ENABLE_SANDBOX else None
     
     # Initialize RAG Context Manager
     context_manager = None
@@ -1240,10 +1296,18 @@ This PR is being automatically generated to address issue #{github_issue_number}
         max_repairs = 10
         repair_count = 0
         test_passed = False
+        commit_task = None
+        
+        prewarm_task.result()
         
         while repair_count < max_repairs:
             test_passed, test_log = run_tests_in_sandbox(REPO_PATH)
             
+            # The previous repair's commit must finish before files are rewritten
+            if commit_task is not None:
+                commit_task.result()
+                commit_task = None
+            
             if test_passed:
                 print("✅ All tests passed!")
                 break
@@ -1295,8 +1359,7 @@ This PR is being automatically generated to address issue #{github_issue_number}
                     related_files=related_files
                 )
                 
-                with open(full_path, "w", encoding="utf-8", newline='\n') as f:
-                    f.write(repaired_code.replace('\r\n', '\n'))
+                write_file_atomic(full_path, repaired_code)
                 
                 # Update our tracking
                 all_file_contents[target_file] = repaired_code
@@ -1313,10 +1376,13 @@ This PR is being automatically generated to address issue #{github_issue_number}
                                               'message': f'Attempting repair {repair_count} of {max_repairs}'
                                           })
             
-            # Commit the repair attempt
+            # Commit the repair attempt while the next test run starts
             if repair_count < max_repairs:
                 commit_msg = f"fix: repair test failures (attempt {repair_count})"
-                pr_manager.commit_and_push(all_files, commit_msg)
+                commit_task = background.submit(pr_manager.commit_and_push, all_files, commit_msg)
+        
+        if commit_task is not None:
+            commit_task.result()
         
         if not test_passed:
             print("❌ Warning: Tests still failing after all repair attempts.")
@@ -1343,6 +1409,8 @@ This PR is being automatically generated to address issue #{github_issue_number}
                                       'test_status': 'Skipped',
                                       'message': 'ENABLE_SANDBOX is False'
                                   })
+    
+    background.shutdown(wait=True)
 
     # PHASE 6: FINALIZE PR
     print("\n" + "="*60)
@@ -1375,21 +1443,17 @@ This PR is being automatically generated to address issue #{github_issue_number}
         if not review_approved:
             review_notes = f"\n\n## ⚠️ Review Notes\n\n{last_review_result}\n"
         
-        final_pr_body = f"""{final_body_base}
-
-## Implementation Details
-
-{implementation_plan}
-
-## Files Modified
-{chr(10).join(f'- `{f}`' for f in files_to_modify)}
-
-## Files Created
-{chr(10).join(f'- `{f}`' for f in files_to_create)}
-{review_notes}
----
-*Generated by AI Agent V{AGENT_VERSION} with comprehensive analysis, review loop, and iterative development*
-"""
+        buf = io.StringIO()
+        buf.write(final_body_base)
+        buf.write("\n\n## Implementation Details\n\n")
+        buf.write(implementation_plan)
+        buf.write("\n\n## Files Modified\n")
+        buf.writelines(f"- `{f}`\n" for f in files_to_modify)
+        buf.write("\n## Files Created\n")
+        buf.writelines(f"- `{f}`\n" for f in files_to_create)
+        buf.write(review_notes)
+        buf.write(f"\n---\n*Generated by AI Agent V{AGENT_VERSION} with comprehensive analysis, review loop, and iterative development*\n")
+        final_pr_body = buf.getvalue()
         
         # Finalize the PR (remove WIP prefix and update content)
         pr_manager.finalize_pr(final_title, final_pr_body)
@@ -1405,6 +1469,8 @@ This PR is being automatically generated to address issue #{github_issue_number}
         import traceback
         traceback.print_exc()
         print("PR remains in WIP state")
+        # Don't lose progress updates that were still being coalesced
+        pr_manager.flush()
 
 if __name__ == "__main__":
     main()
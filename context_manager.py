@@ -7,11 +7,40 @@ than relying on fixed file limits.
 """
 
 import os
+import json
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Tuple, Optional, Any
 import chromadb
 from chromadb.config import Settings
 
+# Optional: encode embeddings ourselves (on GPU when available) instead of
+# letting ChromaDB's default embedding function do it batch by batch
+try:
+    import torch
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+# Optional: product-quantized FAISS index for very large codebases
+try:
+    import faiss
+    import numpy as np
+except ImportError:
+    faiss = None
+
+# Model used for precomputed embeddings (same model as ChromaDB's default)
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# IVF-PQ settings: above PQ_INDEX_THRESHOLD chunks, searches go through a
+# compressed FAISS index (48 bytes per 384-D vector instead of 1.5KB)
+PQ_INDEX_THRESHOLD = 50000
+PQ_TRAIN_SIZE = 10000
+PQ_NLIST = 256
+PQ_M = 48
+PQ_NBITS = 8
+PQ_NPROBE = 8
+
 
 class CodeContextManager:
     """Manages code embeddings and semantic search using ChromaDB."""
@@ -31,12 +60,24 @@ class CodeContextManager:
             persist_directory = os.path.join(repo_path, ".chroma")
         
         self.persist_directory = persist_directory
+        self.manifest_path = os.path.join(persist_directory, "manifest.json")
+        
+        # Use a local sentence-transformers encoder if installed, otherwise
+        # fall back to ChromaDB's built-in embedding function
+        self.encoder = None
+        if SentenceTransformer is not None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            self.encoder = SentenceTransformer(EMBEDDING_MODEL, device=device)
         
-        # Initialize ChromaDB client with persistent storage
-        self.client = chromadb.Client(Settings(
-            persist_directory=persist_directory,
-            anonymized_telemetry=False
-        ))
+        # Compressed secondary index, built by index_codebase for large repos
+        self.pq_index = None
+        self.pq_ids = []
+        
+        # Initialize ChromaDB client with persistent (SQLite-backed) storage
+        self.client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(anonymized_telemetry=False)
+        )
         
         # Collection name based on repo path hash for uniqueness
         repo_hash = hashlib.md5(repo_path.encode()).hexdigest()[:8]
@@ -52,6 +93,23 @@ class CodeContextManager:
                 metadata={"repo_path": repo_path}
             )
     
+    def _encode(self, texts: List[str]):
+        """
+        Encode texts into normalized embeddings with the local encoder.
+        
+        Args:
+            texts: Texts to encode
+            
+        Returns:
+            NumPy array of shape (len(texts), embedding_dim)
+        """
+        return self.encoder.encode(
+            texts,
+            batch_size=256,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+    
     def _chunk_code(self, code: str, filename: str, chunk_size: int = 1000) -> List[Dict[str, str]]:
         """
         Chunk code into manageable pieces for embedding.
@@ -59,6 +117,9 @@ class CodeContextManager:
         For Python files, tries to chunk by functions/classes.
         For other files, uses simple line-based chunking.
         
+        Chunks are sliced straight out of `code` using precomputed line
+        offsets rather than splitting into lines and re-joining them.
+        
         Args:
             code: The code content
             filename: Name of the file
@@ -69,10 +130,31 @@ class CodeContextManager:
         """
         chunks = []
         
+        # offsets[n] is the start of line n+1; line n ends just before offsets[n]
+        offsets = [0]
+        pos = code.find('\n')
+        while pos != -1:
+            offsets.append(pos + 1)
+            pos = code.find('\n', pos + 1)
+        num_lines = len(offsets)
+        
+        def line_end(n):
+            """Offset just past the content of 1-indexed line n (excluding its newline)."""
+            return offsets[n] - 1 if n < num_lines else len(code)
+        
+        def chunk_length(start, end):
+            """Length of the chunk spanning lines start..end (0 if empty)."""
+            return line_end(end) - offsets[start - 1] if start <= end else 0
+        
+        def emit(start, end):
+            chunks.append({
+                'content': code[offsets[start - 1]:line_end(end)],
+                'start_line': start,
+                'end_line': end
+            })
+        
         if filename.endswith('.py'):
             # Try to chunk by functions/classes
-            lines = code.split('\n')
-            current_chunk = []
             current_start = 1
             in_function_or_class = False
             indent_level = 0
@@ -80,25 +162,20 @@ class CodeContextManager:
             # Track if we've seen any function/class yet
             has_seen_definition = False
             
-            for i, line in enumerate(lines, 1):
+            for i in range(1, num_lines + 1):
+                line = code[offsets[i - 1]:line_end(i)]
                 stripped = line.lstrip()
                 
                 # Detect function or class definition
                 if stripped.startswith(('def ', 'class ', 'async def ')):
                     # Save previous chunk if it exists
-                    if current_chunk:
-                        chunks.append({
-                            'content': '\n'.join(current_chunk),
-                            'start_line': current_start,
-                            'end_line': i - 1
-                        })
-                    current_chunk = [line]
+                    if current_start < i:
+                        emit(current_start, i - 1)
                     current_start = i
                     in_function_or_class = True
                     has_seen_definition = True
                     indent_level = len(line) - len(stripped)
                 elif in_function_or_class:
-                    current_chunk.append(line)
                     # Check if we've exited the function/class (simplified heuristic)
                     # A non-empty line with same or less indentation than the def/class line
                     # likely indicates we've exited (unless it's a continuation or decorator)
@@ -108,79 +185,97 @@ class CodeContextManager:
                         if not stripped.startswith(('@', '"', "'", '#')):
                             in_function_or_class = False
                 else:
-                    current_chunk.append(line)
-                    
                     # Special handling for module-level code before first definition
                     # If we haven't seen a definition yet and chunk is getting large,
                     # save it as "imports and module constants" chunk
                     # Check every 10 lines to reduce overhead
                     if not has_seen_definition and i % 10 == 0:
-                        chunk_content = '\n'.join(current_chunk)
-                        if len(chunk_content) > chunk_size // 2:
-                            chunks.append({
-                                'content': chunk_content,
-                                'start_line': current_start,
-                                'end_line': i
-                            })
-                            current_chunk = []
+                        if chunk_length(current_start, i) > chunk_size // 2:
+                            emit(current_start, i)
                             current_start = i + 1
                 
                 # Also split if chunk gets too large
                 # Check every 10 lines to reduce overhead
                 if i % 10 == 0:
-                    chunk_content = '\n'.join(current_chunk)
-                    if len(chunk_content) > chunk_size:
-                        chunks.append({
-                            'content': chunk_content,
-                            'start_line': current_start,
-                            'end_line': i
-                        })
-                        current_chunk = []
+                    if chunk_length(current_start, i) > chunk_size:
+                        emit(current_start, i)
                         current_start = i + 1
             
             # Add final chunk - this ensures trailing code is captured
-            if current_chunk:
-                chunks.append({
-                    'content': '\n'.join(current_chunk),
-                    'start_line': current_start,
-                    'end_line': len(lines)
-                })
+            if current_start <= num_lines:
+                emit(current_start, num_lines)
         else:
             # Simple line-based chunking for non-Python files
-            lines = code.split('\n')
-            current_chunk = []
             current_start = 1
             
-            for i, line in enumerate(lines, 1):
-                current_chunk.append(line)
-                
-                if len('\n'.join(current_chunk)) > chunk_size:
-                    chunks.append({
-                        'content': '\n'.join(current_chunk),
-                        'start_line': current_start,
-                        'end_line': i
-                    })
-                    current_chunk = []
+            for i in range(1, num_lines + 1):
+                if chunk_length(current_start, i) > chunk_size:
+                    emit(current_start, i)
                     current_start = i + 1
             
             # Add final chunk
-            if current_chunk:
-                chunks.append({
-                    'content': '\n'.join(current_chunk),
-                    'start_line': current_start,
-                    'end_line': len(lines)
-                })
-        
-        return chunks if chunks else [{'content': code, 'start_line': 1, 'end_line': len(code.split('\n'))}]
+            if current_start <= num_lines:
+                emit(current_start, num_lines)
+        
+        return chunks if chunks else [{'content': code, 'start_line': 1, 'end_line': num_lines}]
+    
+    def _stat_file(self, file_path: str) -> Optional[List[int]]:
+        """Return [mtime_ns, size] for a repo file, or None if it can't be stat'ed."""
+        try:
+            st = os.stat(os.path.join(self.repo_path, file_path))
+            return [st.st_mtime_ns, st.st_size]
+        except OSError:
+            return None
+    
+    def _load_manifest(self) -> Dict[str, List[int]]:
+        """Load the {file_path: [mtime_ns, size]} manifest from the last indexing run."""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_manifest(self, manifest: Dict[str, List[int]]):
+        """Persist the indexing manifest next to the vector database."""
+        try:
+            os.makedirs(self.persist_directory, exist_ok=True)
+            with open(self.manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+        except OSError as e:
+            print(f"Warning: Could not write index manifest: {e}")
     
     def index_codebase(self, file_list: List[str], force_reindex: bool = False):
         """
         Index the codebase into the vector database.
         
+        Only files whose mtime or size changed since the last run are
+        re-chunked; chunks for files no longer in file_list are removed.
+        
         Args:
             file_list: List of file paths to index
             force_reindex: If True, clear existing index and reindex all files
         """
+        with ThreadPoolExecutor() as executor:
+            current_stats = dict(zip(file_list, executor.map(self._stat_file, file_list)))
+        
+        # The manifest is only trustworthy if the collection actually has data
+        previous = {}
+        if not force_reindex and self.collection.count() > 0:
+            previous = self._load_manifest()
+        
+        changed = [p for p in file_list if current_stats[p] is None or previous.get(p) != current_stats[p]]
+        removed = [p for p in previous if p not in current_stats]
+        
+        if not changed and not removed:
+            print(f"✅ Index up to date ({len(file_list)} files unchanged)")
+            if self.encoder is not None and faiss is not None and self.pq_index is None:
+                self._build_pq_index()
+            return
+        
+        # Drop stale chunks so shrunken files don't leave old chunk ids behind
+        if not force_reindex and self.collection.count() > 0:
+            self.collection.delete(where={"file_path": {"$in": changed + removed}})
+        
         if force_reindex:
             # Delete and recreate collection
             try:
@@ -195,8 +290,9 @@ class CodeContextManager:
         documents = []
         metadatas = []
         ids = []
+        failed = set()
         
-        for file_path in file_list:
+        for file_path in changed:
             full_path = os.path.join(self.repo_path, file_path)
             
             try:
@@ -223,39 +319,133 @@ class CodeContextManager:
                     
             except Exception as e:
                 print(f"Warning: Could not index {file_path}: {e}")
+                failed.add(file_path)
                 continue
         
+        # Encode every chunk in one pass so the encoder can batch efficiently
+        embeddings = None
+        if self.encoder is not None and documents:
+            embeddings = self._encode(documents)
+        
         # Add to collection in batches (ChromaDB has limits)
-        batch_size = 5000
+        batch_size = 20000
+        max_batch_size = getattr(self.client, 'max_batch_size', None)
+        if max_batch_size:
+            batch_size = min(batch_size, max_batch_size)
+        
         for i in range(0, len(documents), batch_size):
-            batch_docs = documents[i:i+batch_size]
-            batch_meta = metadatas[i:i+batch_size]
-            batch_ids = ids[i:i+batch_size]
+            batch = {
+                'documents': documents[i:i+batch_size],
+                'metadatas': metadatas[i:i+batch_size],
+                'ids': ids[i:i+batch_size]
+            }
+            if embeddings is not None:
+                batch['embeddings'] = embeddings[i:i+batch_size].tolist()
             
-            self.collection.add(
-                documents=batch_docs,
-                metadatas=batch_meta,
-                ids=batch_ids
-            )
+            self.collection.add(**batch)
+        
+        print(f"✅ Indexed {len(documents)} code chunks from {len(changed)} changed files ({len(file_list)} total)")
+        
+        # Leave unreadable files out of the manifest so they are retried next run
+        self._save_manifest({
+            p: stats for p, stats in current_stats.items()
+            if stats is not None and p not in failed
+        })
+        
+        if self.encoder is not None and faiss is not None:
+            self._build_pq_index()
+    
+    def _build_pq_index(self):
+        """
+        Build an IVF-PQ FAISS index over the collection's embeddings.
+        
+        Only used once the collection exceeds PQ_INDEX_THRESHOLD chunks; for
+        smaller codebases ChromaDB's own index is fast enough.
+        """
+        self.pq_index = None
+        self.pq_ids = []
         
-        print(f"✅ Indexed {len(documents)} code chunks from {len(file_list)} files")
+        if self.collection.count() <= PQ_INDEX_THRESHOLD:
+            return
+        
+        stored = self.collection.get(include=['embeddings'])
+        vectors = np.asarray(stored['embeddings'], dtype='float32')
+        dim = vectors.shape[1]
+        
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, PQ_NLIST, PQ_M, PQ_NBITS)
+        index.train(vectors[:PQ_TRAIN_SIZE])
+        index.add(vectors)
+        index.nprobe = PQ_NPROBE
+        
+        self.pq_index = index
+        self.pq_ids = stored['ids']
+        print(f"✅ Built IVF-PQ index over {len(self.pq_ids)} chunks")
     
-    def semantic_search(self, query: str, n_results: int = 10) -> List[Dict[str, Any]]:
+    def _pq_search(self, query: str, n_results: int) -> List[Dict[str, Any]]:
+        """
+        Search the IVF-PQ index and look up the matching chunks in ChromaDB.
+        
+        Args:
+            query: The search query
+            n_results: Number of results to return
+            
+        Returns:
+            List of search results in the same format as semantic_search
+        """
+        query_vector = self._encode([query]).astype('float32')
+        distances, positions = self.pq_index.search(query_vector, n_results)
+        
+        hits = [(self.pq_ids[pos], dist) for pos, dist in zip(positions[0], distances[0]) if pos != -1]
+        if not hits:
+            return []
+        
+        stored = self.collection.get(ids=[chunk_id for chunk_id, _ in hits], include=['documents', 'metadatas'])
+        by_id = {chunk_id: (doc, meta) for chunk_id, doc, meta in zip(stored['ids'], stored['documents'], stored['metadatas'])}
+        
+        search_results = []
+        for chunk_id, dist in hits:
+            if chunk_id not in by_id:
+                continue
+            doc, meta = by_id[chunk_id]
+            search_results.append({
+                'file_path': meta['file_path'],
+                'content': doc,
+                'start_line': meta['start_line'],
+                'end_line': meta['end_line'],
+                'distance': float(dist)
+            })
+        
+        return search_results
+    
+    def semantic_search(self, query: str, n_results: int = 10, where: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """
         Perform semantic search on the codebase.
         
         Args:
             query: The search query (e.g., issue description or feature name)
             n_results: Number of results to return
+            where: Optional ChromaDB metadata filter (e.g., {"file_path": {"$nin": [...]}})
             
         Returns:
             List of dictionaries containing file_path, content, relevance score
         """
         try:
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results
-            )
+            # The PQ index has no metadata filtering, so filtered queries go to ChromaDB
+            if self.pq_index is not None and where is None:
+                return self._pq_search(query, n_results)
+            
+            query_args = {'n_results': n_results}
+            if where is not None:
+                query_args['where'] = where
+            
+            # Queries must be embedded with the same model as the documents
+            if self.encoder is not None:
+                query_args['query_embeddings'] = self._encode([query]).tolist()
+            else:
+                query_args['query_texts'] = [query]
+            
+            results = self.collection.query(**query_args)
             
             # Format results
             search_results = []
@@ -287,21 +477,26 @@ class CodeContextManager:
         Returns:
             List of file paths sorted by relevance
         """
-        # Search for relevant chunks
-        results = self.semantic_search(query, n_results=max_files * 3)
-        
-        # Deduplicate by file path and sort by relevance
+        # Results come back in ascending distance order, so the first chunk seen
+        # for each file is its best match and insertion order is relevance order.
+        # Fetch only as many chunks as files are still missing; when several chunks
+        # from the same file collapse the set, re-query excluding the files already found.
         seen_files = {}
-        for result in results:
-            file_path = result['file_path']
-            if file_path not in seen_files:
-                seen_files[file_path] = result['distance'] if result['distance'] else 0
-        
-        # Sort by distance (lower is better)
-        sorted_files = sorted(seen_files.items(), key=lambda x: x[1])
+        where = None
+        while len(seen_files) < max_files:
+            n_results = max_files - len(seen_files)
+            results = self.semantic_search(query, n_results=n_results, where=where)
+            
+            for result in results:
+                seen_files.setdefault(result['file_path'], None)
+            
+            # Fewer chunks than requested means the collection is exhausted
+            if len(results) < n_results:
+                break
+            
+            where = {"file_path": {"$nin": list(seen_files)}}
         
-        # Return file paths
-        return [f[0] for f in sorted_files[:max_files]]
+        return list(seen_files)[:max_files]
     
     def get_file_content_with_context(self, file_path: str, query: str = None) -> str:
         """
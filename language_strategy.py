@@ -5,13 +5,238 @@ This module provides a strategy pattern for handling language-specific
 operations like syntax checking, file extensions, and test commands.
 """
 
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
-import ast
+import functools
+import hashlib
+import importlib.metadata
 import re
+import sqlite3
 import subprocess
+import sys
 import tempfile
+import threading
+import time
+import warnings
 import os
-from typing import Tuple, List, Optional
+from typing import Tuple, List, Dict, Optional
+
+# Optional: lint in-process with the libraries flake8 wraps, avoiding a
+# subprocess and flake8's plugin discovery on every call
+try:
+    import pycodestyle
+    import pyflakes.api
+except ImportError:
+    pycodestyle = None
+
+try:
+    # Lets in-process pyflakes messages carry the same F-codes flake8 prints
+    from flake8.plugins.pyflakes import FLAKE8_PYFLAKES_CODES
+except ImportError:
+    FLAKE8_PYFLAKES_CODES = {}
+
+# Codes ignored by the linter (same as the flake8 --ignore list)
+# E501: line too long
+# W503: line break before binary operator (style preference)
+LINTER_IGNORE = ['E501', 'W503']
+LINTER_MAX_LINE_LENGTH = 120
+
+# Failing test file path in pytest output
+_FAILING_TEST_RE = re.compile(r'(tests[\\/][a-zA-Z0-9_]+\.py)')
+
+# Maximum filenames PythonStrategy remembers its last lint result for
+LAST_LINT_MAX_ENTRIES = 2048
+
+# Number of test suffixes above which MultiLanguageStrategy matches them with a regex
+TEST_SUFFIX_REGEX_THRESHOLD = 50
+
+# One line of flake8 output: "<path>.py:<line>:<col>: <code> <message>"
+_FLAKE8_LINE_RE = re.compile(r'^(?P<path>.+?\.py):(?P<rest>\d+:\d+: .*)$')
+
+# On-disk cache of validation results shared across agent runs
+SYNTAX_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ai_agent", "syntax.db")
+
+# Results kept in the on-disk cache; the least recently used are pruned on open
+SYNTAX_CACHE_MAX_ENTRIES = 50000
+
+# A hit only refreshes its last-used time once it is this many seconds stale,
+# so repeated lookups stay read-only
+SYNTAX_CACHE_TOUCH_INTERVAL = 3600
+
+# Syntax verdicts depend on the interpreter's grammar, so they're cached per Python version
+_COMPILE_CACHE_KIND = f"compile-py{sys.version_info[0]}.{sys.version_info[1]}"
+
+
+@functools.lru_cache(maxsize=1)
+def _linter_versions() -> str:
+    """Describe the lint backend in use and its versions, for cache keys."""
+    try:
+        flake8_version = importlib.metadata.version('flake8')
+    except importlib.metadata.PackageNotFoundError:
+        flake8_version = 'none'
+    if pycodestyle is not None:
+        backend = f"inproc-pycodestyle{pycodestyle.__version__}-pyflakes{pyflakes.__version__}"
+    else:
+        backend = "subprocess"
+    return f"{backend}-flake8{flake8_version}-py{sys.version_info[0]}.{sys.version_info[1]}"
+
+
+def _lint_cache_kind() -> str:
+    """Cache kind for lint results: changes with the backend, versions and linter settings."""
+    return f"flake8-{_linter_versions()}-ignore{','.join(LINTER_IGNORE)}-max{LINTER_MAX_LINE_LENGTH}"
+
+
+class _SyntaxCache:
+    """
+    Persistent (content hash, validator) -> (ok, message) cache backed by SQLite.
+    
+    Each row records when it was last used; on open, everything beyond the
+    SYNTAX_CACHE_MAX_ENTRIES most recently used rows is deleted.
+    
+    Any SQLite or filesystem error disables the cache for the rest of the run
+    rather than failing validation.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._disabled = False
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(*parts: str) -> bytes:
+        """Hash the given strings into a 16-byte cache key."""
+        h = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            h.update(part.encode('utf-8'))
+            h.update(b'\0')
+        return h.digest()
+    
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and not self._disabled:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Table "v" predates the last-used column and was never pruned
+            conn.execute("DROP TABLE IF EXISTS v")
+            conn.execute("CREATE TABLE IF NOT EXISTS results "
+                         "(h BLOB, kind TEXT, ok INT, msg TEXT, accessed INT, PRIMARY KEY (h, kind))")
+            conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            conn.execute("DELETE FROM results WHERE rowid IN "
+                         "(SELECT rowid FROM results ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                         (SYNTAX_CACHE_MAX_ENTRIES,))
+            conn.commit()
+            self._conn = conn
+        return self._conn
+    
+    def get(self, h: bytes, kind: str) -> Optional[Tuple[bool, Optional[str]]]:
+        """Return the cached (ok, message) for a key, or None on a miss."""
+        with self._lock:
+            try:
+                conn = self._connect()
+                if conn is None:
+                    return None
+                row = conn.execute("SELECT ok, msg, accessed FROM results WHERE h=? AND kind=?",
+                                   (h, kind)).fetchone()
+                now = int(time.time())
+                if row and now - (row[2] or 0) >= SYNTAX_CACHE_TOUCH_INTERVAL:
+                    conn.execute("UPDATE results SET accessed=? WHERE h=? AND kind=?", (now, h, kind))
+                    conn.commit()
+            except (sqlite3.Error, OSError) as e:
+                print(f"Warning: Syntax cache disabled: {e}")
+                self._disabled = True
+                return None
+        return (bool(row[0]), row[1]) if row else None
+    
+    def put(self, h: bytes, kind: str, ok: bool, msg: Optional[str]):
+        """Store a validation result."""
+        with self._lock:
+            try:
+                conn = self._connect()
+                if conn is None:
+                    return
+                conn.execute("INSERT OR REPLACE INTO results (h, kind, ok, msg, accessed) "
+                             "VALUES (?, ?, ?, ?, ?)",
+                             (h, kind, int(ok), msg, int(time.time())))
+                conn.commit()
+            except (sqlite3.Error, OSError) as e:
+                print(f"Warning: Syntax cache disabled: {e}")
+                self._disabled = True
+
+
+_syntax_cache = _SyntaxCache(SYNTAX_CACHE_PATH)
+
+
+class _CollectingReporter:
+    """pyflakes reporter that collects (line, col, message) tuples."""
+    
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.messages = []
+    
+    def unexpectedError(self, filename, msg):
+        self.messages.append((0, 0, f"{self.filename}:0:1: E902 {msg}"))
+    
+    def syntaxError(self, filename, msg, lineno, offset, text):
+        self.messages.append((lineno or 0, offset or 0, f"{self.filename}:{lineno}:{offset or 1}: E999 {msg}"))
+    
+    def flake(self, message):
+        code = FLAKE8_PYFLAKES_CODES.get(type(message).__name__)
+        text = message.message % message.message_args
+        if code:
+            text = f"{code} {text}"
+        self.messages.append((message.lineno, message.col, f"{self.filename}:{message.lineno}:{message.col + 1}: {text}"))
+
+
+if pycodestyle is not None:
+    class _CollectingReport(pycodestyle.BaseReport):
+        """pycodestyle report that collects (line, col, message) tuples."""
+        
+        def __init__(self, options):
+            super().__init__(options)
+            self.collected = []
+        
+        def error(self, line_number, offset, text, check):
+            code = super().error(line_number, offset, text, check)
+            if code:
+                self.collected.append((line_number, offset, f"{self.filename}:{line_number}:{offset + 1}: {text}"))
+            return code
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_python(code: str) -> Tuple[bool, Optional[str]]:
+    """
+    Parse Python source and return (is_valid, error_message).
+    
+    Cached on the source text so the review/repair loops, which re-check
+    the same file content several times, only pay for the parse once.
+    Results are also persisted so later runs can skip the parse entirely.
+    """
+    h = _SyntaxCache.key(code)
+    cached = _syntax_cache.get(h, _COMPILE_CACHE_KIND)
+    if cached is not None:
+        return cached
+    
+    try:
+        # Compiling to bytecode validates syntax without materializing the
+        # Python-level AST objects that ast.parse builds and we'd discard.
+        # Silence SyntaxWarnings (e.g. invalid escapes) that compile emits.
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            compile(code, '<string>', 'exec', dont_inherit=True)
+        result = (True, None)
+    except SyntaxError as e:
+        error_msg = f"SyntaxError at line {e.lineno}: {e.msg}"
+        if e.text:
+            error_msg += f"\nLine content: {e.text}"
+        result = (False, error_msg)
+    except Exception as e:
+        result = (False, str(e))
+    
+    _syntax_cache.put(h, _COMPILE_CACHE_KIND, *result)
+    return result
 
 
 class LanguageStrategy(ABC):
@@ -63,6 +288,16 @@ class LanguageStrategy(ABC):
 class PythonStrategy(LanguageStrategy):
     """Python-specific strategy implementation."""
     
+    # Shared pycodestyle configuration, built once on first use
+    _style_guide = None
+    
+    def __init__(self):
+        # None until the first flake8 run tells us whether it is installed
+        self._flake8_available: Optional[bool] = None
+        
+        # Last lint result per filename: {filename: (cache_key, result)}
+        self._last_lint: Dict[str, Tuple[bytes, Tuple[bool, Optional[str]]]] = {}
+    
     def get_code_extensions(self) -> tuple:
         return (".py",)
     
@@ -74,16 +309,11 @@ class PythonStrategy(LanguageStrategy):
         if not filename.endswith(".py"):
             return True, None
         
-        try:
-            ast.parse(code)
+        # Whitespace-only source always parses; skip hashing it into the cache
+        if not code.strip():
             return True, None
-        except SyntaxError as e:
-            error_msg = f"SyntaxError at line {e.lineno}: {e.msg}"
-            if e.text:
-                error_msg += f"\nLine content: {e.text}"
-            return False, error_msg
-        except Exception as e:
-            return False, str(e)
+        
+        return _parse_python(code)
     
     def get_docker_image(self) -> str:
         return "python:3.11-slim"
@@ -102,7 +332,7 @@ class PythonStrategy(LanguageStrategy):
         Returns:
             Path to failing test file or None
         """
-        match = re.search(r'(tests[\\/][a-zA-Z0-9_]+\.py)', test_log)
+        match = _FAILING_TEST_RE.search(test_log)
         if match:
             return match.group(1).replace("\\", "/")
         return None
@@ -118,56 +348,163 @@ class PythonStrategy(LanguageStrategy):
         Returns:
             Tuple of (is_clean, linter_output)
         """
-        if not filename.endswith(".py"):
-            return True, None
+        return self.run_linter_batch({filename: code})[filename]
+    
+    def run_linter_batch(self, files: Dict[str, str]) -> Dict[str, Tuple[bool, Optional[str]]]:
+        """
+        Run linter (flake8) on several Python files with a single flake8 process.
         
-        # Write code to temporary file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            f.write(code)
-            temp_file = f.name
+        Args:
+            files: Dictionary of filename -> code
+            
+        Returns:
+            Dictionary of filename -> (is_clean, linter_output)
+        """
+        results = {}
+        pending = {}
+        lint_kind = _lint_cache_kind()
         
-        try:
-            # Run flake8 with reasonable settings
-            # Note: flake8 is from requirements.txt, not arbitrary PATH executable
-            # Ignore some common issues that don't affect functionality:
-            # E501: line too long
-            # W503: line break before binary operator (style preference)
-            result = subprocess.run(
-                ['flake8', '--ignore=E501,W503', '--max-line-length=120', temp_file],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+        for filename, code in files.items():
+            if not filename.endswith(".py"):
+                results[filename] = (True, None)
+                continue
+            
+            # flake8 output mentions the filename, so it is part of the key
+            cache_key = _SyntaxCache.key(filename, code)
+            
+            # Unchanged since this file was last linted: skip even the SQLite lookup
+            last = self._last_lint.get(filename)
+            if last is not None and last[0] == cache_key:
+                results[filename] = last[1]
+                continue
             
-            if result.returncode == 0:
-                return True, None
+            cached = _syntax_cache.get(cache_key, lint_kind)
+            if cached is not None:
+                results[filename] = cached
+                self._remember_lint(filename, cache_key, cached)
             else:
-                # Parse output to make it more readable
-                output_lines = []
-                for line in result.stdout.splitlines():
-                    # Replace temp file path with actual filename
-                    line = line.replace(temp_file, filename)
-                    output_lines.append(line)
-                
-                return False, '\n'.join(output_lines)
-                
+                pending[filename] = (code, cache_key)
+        
+        if not pending:
+            return results
+        
+        if pycodestyle is not None:
+            for filename, (code, cache_key) in pending.items():
+                results[filename] = self._lint_in_process(code, filename)
+                _syntax_cache.put(cache_key, lint_kind, *results[filename])
+                self._remember_lint(filename, cache_key, results[filename])
+            return results
+        
+        # Don't keep re-spawning flake8 once we know it isn't installed
+        if self._flake8_available is False:
+            for filename in pending:
+                results[filename] = (True, None)
+            return results
+        
+        # Run flake8 with reasonable settings
+        # Note: flake8 is from requirements.txt, not arbitrary PATH executable
+        flake8_cmd = ['flake8', f"--ignore={','.join(LINTER_IGNORE)}",
+                      f"--max-line-length={LINTER_MAX_LINE_LENGTH}"]
+        
+        try:
+            if len(pending) == 1:
+                # A single file is piped over stdin under its real name, no temp files needed
+                (filename, (code, _)), = pending.items()
+                temp_names = {filename: filename}
+                result = subprocess.run(
+                    flake8_cmd + ['--stdin-display-name', filename, '-'],
+                    input=code,
+                    capture_output=True,
+                    text=True,
+                    timeout=10
+                )
+            else:
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    # Files are written under neutral names; flake8 paths are mapped back below
+                    temp_names = {}
+                    for index, (filename, (code, _)) in enumerate(pending.items()):
+                        temp_file = os.path.join(temp_dir, f"{index}.py")
+                        with open(temp_file, 'w', encoding='utf-8') as f:
+                            f.write(code)
+                        temp_names[temp_file] = filename
+                    
+                    result = subprocess.run(
+                        flake8_cmd + ['-j', 'auto', *temp_names],
+                        capture_output=True,
+                        text=True,
+                        timeout=10 + len(temp_names)
+                    )
+            
+            self._flake8_available = True
+            
+            # Group output lines by source file, replacing temp paths with real filenames
+            output_lines = {filename: [] for filename in pending}
+            for line in result.stdout.splitlines():
+                match = _FLAKE8_LINE_RE.match(line)
+                if match and match.group('path') in temp_names:
+                    filename = temp_names[match.group('path')]
+                    output_lines[filename].append(f"{filename}:{match.group('rest')}")
+            
+            for filename, (_, cache_key) in pending.items():
+                if output_lines[filename]:
+                    results[filename] = (False, '\n'.join(output_lines[filename]))
+                else:
+                    results[filename] = (True, None)
+                _syntax_cache.put(cache_key, lint_kind, *results[filename])
+                self._remember_lint(filename, cache_key, results[filename])
+        
         except FileNotFoundError:
-            # flake8 not installed, skip linting
+            # flake8 not installed, skip linting (for the rest of the run)
             print("Warning: flake8 not found, skipping linting")
-            return True, None
+            self._flake8_available = False
         except subprocess.TimeoutExpired:
             print("Warning: flake8 timed out")
-            return True, None
         except Exception as e:
             print(f"Warning: Linting failed: {e}")
+        
+        # Files that could not be linted are treated as clean (and not cached)
+        for filename in pending:
+            results.setdefault(filename, (True, None))
+        
+        return results
+    
+    def _remember_lint(self, filename: str, cache_key: bytes, result: Tuple[bool, Optional[str]]):
+        """Record the latest lint result for a filename, evicting the oldest past the cap."""
+        self._last_lint.pop(filename, None)
+        self._last_lint[filename] = (cache_key, result)
+        if len(self._last_lint) > LAST_LINT_MAX_ENTRIES:
+            del self._last_lint[next(iter(self._last_lint))]
+    
+    def _lint_in_process(self, code: str, filename: str) -> Tuple[bool, Optional[str]]:
+        """
+        Lint code with pyflakes and pycodestyle directly (the checks flake8 runs).
+        
+        Args:
+            code: The code to lint
+            filename: Name of the file (used in the output)
+            
+        Returns:
+            Tuple of (is_clean, linter_output)
+        """
+        if PythonStrategy._style_guide is None:
+            PythonStrategy._style_guide = pycodestyle.StyleGuide(
+                ignore=LINTER_IGNORE,
+                max_line_length=LINTER_MAX_LINE_LENGTH,
+                quiet=True
+            )
+        
+        reporter = _CollectingReporter(filename)
+        pyflakes.api.check(code, filename, reporter)
+        
+        report = _CollectingReport(PythonStrategy._style_guide.options)
+        checker = pycodestyle.Checker(filename, lines=code.splitlines(True),
+                                      options=PythonStrategy._style_guide.options, report=report)
+        checker.check_all()
+        
+        messages = sorted(reporter.messages + report.collected, key=lambda m: (m[0], m[1]))
+        if not messages:
             return True, None
-        finally:
-            # Clean up temp file
-            try:
-                os.unlink(temp_file)
-            except (OSError, FileNotFoundError) as e:
-                # File cleanup failed, but not critical
-                pass
+        return False, '\n'.join(m[2] for m in messages)
 
 
 class MultiLanguageStrategy(LanguageStrategy):
@@ -186,26 +523,66 @@ class MultiLanguageStrategy(LanguageStrategy):
             strategies: List of LanguageStrategy instances
         """
         self.strategies = strategies
+        
+        # Precompute extension lookups once instead of asking every strategy per call
+        self._code_extensions = tuple(ext for s in strategies for ext in s.get_code_extensions())
+        self._test_extensions = tuple(ext for s in strategies for ext in s.get_test_extensions())
+        
+        # tuple.endswith is fastest for a handful of suffixes; past that, one
+        # anchored alternation regex beats scanning every suffix per file
+        self._test_suffix_re = None
+        if len(self._test_extensions) > TEST_SUFFIX_REGEX_THRESHOLD:
+            self._test_suffix_re = re.compile(
+                '(?:' + '|'.join(re.escape(ext) for ext in self._test_extensions) + r')\Z'
+            )
+        
+        # Map simple extensions (".py") straight to the first strategy that claims them.
+        # Compound suffixes (".d.ts", "_test.py") can't be found with splitext, so they
+        # keep the ordered endswith() scan.
+        # Entries carry the strategy's position so the earliest strategy still wins.
+        self._ext_code = {}
+        self._compound_code = []
+        for index, strategy in enumerate(strategies):
+            for ext in strategy.get_code_extensions():
+                if ext.startswith('.') and ext.count('.') == 1:
+                    self._ext_code.setdefault(ext, (index, strategy))
+                else:
+                    self._compound_code.append((ext, index, strategy))
+    
+    def _strategy_for(self, filename: str) -> Optional[LanguageStrategy]:
+        """Return the strategy responsible for a file, or None."""
+        match = self._ext_code.get(os.path.splitext(filename)[1])
+        for ext, index, strategy in self._compound_code:
+            if match is not None and index >= match[0]:
+                break
+            if filename.endswith(ext):
+                match = (index, strategy)
+                break
+        return match[1] if match is not None else None
     
     def get_code_extensions(self) -> tuple:
         """Return combined code extensions from all strategies."""
-        extensions = []
-        for strategy in self.strategies:
-            extensions.extend(strategy.get_code_extensions())
-        return tuple(extensions)
+        return self._code_extensions
     
     def get_test_extensions(self) -> tuple:
         """Return combined test extensions from all strategies."""
-        extensions = []
-        for strategy in self.strategies:
-            extensions.extend(strategy.get_test_extensions())
-        return tuple(extensions)
+        return self._test_extensions
+    
+    def is_code_file(self, filename: str) -> bool:
+        """Check if a file is a code file for any of the strategies."""
+        return self._strategy_for(filename) is not None
+    
+    def is_test_file(self, filename: str) -> bool:
+        """Check if a file is a test file for any of the strategies."""
+        if self._test_suffix_re is not None:
+            return self._test_suffix_re.search(filename) is not None
+        return filename.endswith(self._test_extensions)
     
     def check_syntax(self, code: str, filename: str) -> Tuple[bool, Optional[str]]:
         """Check syntax using the appropriate strategy for the file."""
-        for strategy in self.strategies:
-            if filename.endswith(strategy.get_code_extensions()):
-                return strategy.check_syntax(code, filename)
+        strategy = self._strategy_for(filename)
+        if strategy is not None:
+            return strategy.check_syntax(code, filename)
         # If no specific strategy found, assume valid
         return True, None
     
@@ -8,14 +8,120 @@ This module manages the lifecycle of a pull request including:
 - Committing and pushing changes
 """
 
+from __future__ import annotations
+
+import atexit
+import functools
+import hashlib
+import os
+import threading
+import time
 import subprocess
 import json
 import re
-from typing import Optional, Dict
+import urllib.parse
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Tuple
+from git.exc import GitCommandError
+
+# Optional: talk to the GitHub REST API over one persistent connection
+# instead of spawning the gh CLI for every PR operation
+try:
+    import httpx
+    HTTP_ERRORS = (httpx.HTTPError,)
+except ImportError:
+    httpx = None
+    HTTP_ERRORS = ()
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Optional: orjson decodes JSON (LLM replies, gh and API output) faster than json
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
 
 # Maximum files to display in progress updates
 MAX_FILES_TO_DISPLAY = 10
 
+# Minimum seconds between progress comments; updates in between are coalesced
+PROGRESS_MIN_INTERVAL = 5.0
+
+GITHUB_API_URL = "https://api.github.com"
+
+# PR number from the URL printed by `gh pr create`
+_PR_URL_RE = re.compile(r'/pull/(\d+)')
+
+# owner/repo from an HTTPS or SSH GitHub remote URL
+_GITHUB_REMOTE_RE = re.compile(r'github\.com[:/]([^/]+/[^/]+?)(?:\.git)?/?$')
+
+# Open PRs already known in this process: _pr_cache_key(repo_path, branch) -> (number, url)
+_PR_CACHE = {}
+
+# Managers whose queued progress updates are posted at exit; weak so that
+# registering doesn't keep a manager (and its HTTP client) alive
+_LIVE_MANAGERS = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all_at_exit():
+    """Post progress updates still queued on any live PRManager."""
+    for manager in list(_LIVE_MANAGERS):
+        manager._flush_at_exit()
+
+
+def _pr_cache_key(repo_path: str, branch: str) -> Tuple[str, str]:
+    """Key for _PR_CACHE, so relative, absolute and symlinked repo paths agree."""
+    return os.path.realpath(repo_path), branch
+
+
+def _run_bin(argv: list, input_: bytes = None, timeout: float = None, cwd: str = None) -> Tuple[int, bytes, bytes]:
+    """
+    Run a command with binary pipes and return (returncode, stdout, stderr).
+    
+    Output is left as bytes so callers only decode what they actually use.
+    """
+    proc = subprocess.Popen(
+        argv,
+        cwd=cwd,
+        stdin=subprocess.PIPE if input_ is not None else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    try:
+        out, err = proc.communicate(input_, timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        raise
+    return proc.returncode, out, err
+
+
+@functools.lru_cache(maxsize=1)
+def _github_token() -> Optional[str]:
+    """
+    Return a GitHub token from the environment or the gh CLI's login.
+    
+    Resolved once per process; gh is only asked when no token variable is set.
+    """
+    token = os.environ.get("GH_TOKEN") or os.environ.get("GITHUB_TOKEN")
+    if token:
+        return token
+    try:
+        returncode, out, _ = _run_bin(["gh", "auth", "token"], timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if returncode != 0:
+        return None
+    return out.decode('utf-8', errors='replace').strip() or None
+
 
 def format_file_list(files: list, label: str) -> str:
     """
@@ -31,12 +137,11 @@ def format_file_list(files: list, label: str) -> str:
     if not files:
         return ""
     
-    result = f"\n**{label}:** {len(files)}\n"
-    for f in files[:MAX_FILES_TO_DISPLAY]:
-        result += f"- `{f}`\n"
+    lines = [f"\n**{label}:** {len(files)}\n"]
+    lines.extend(f"- `{f}`\n" for f in files[:MAX_FILES_TO_DISPLAY])
     if len(files) > MAX_FILES_TO_DISPLAY:
-        result += f"- ... and {len(files) - MAX_FILES_TO_DISPLAY} more\n"
-    return result
+        lines.append(f"- ... and {len(files) - MAX_FILES_TO_DISPLAY} more\n")
+    return "".join(lines)
 
 
 class PRManager:
@@ -56,10 +161,164 @@ class PRManager:
         self.branch_name = branch_name
         self.issue_number = issue_number
         self.repo_path = repo_path or repo.working_dir
-        self.pr_number = None
-        self.pr_url = None
+        self.pr_number, self.pr_url = _PR_CACHE.get(_pr_cache_key(self.repo_path, branch_name), (None, None))
         self.is_wip = True
         self.initial_body = None  # Store the initial detailed body
+        
+        # Progress updates waiting to be posted as one coalesced comment
+        self._pending_progress = []
+        self._last_flush = 0.0
+        self._min_interval = PROGRESS_MIN_INTERVAL
+        
+        # Comments are posted on one background thread (keeps them in order)
+        # so the agent loop doesn't wait on GitHub for progress updates
+        self._comment_worker = None
+        self._comment_futures = []
+        
+        # Coalesced updates are posted once the interval runs out even if no
+        # further update arrives; anything still queued is posted at exit
+        self._progress_lock = threading.Lock()
+        self._flush_timer = None
+        _LIVE_MANAGERS.add(self)
+        
+        # Digest of the last comment posted, so an identical repeat is skipped
+        self._last_comment_hash = None
+        
+        # Digest of the last progress update queued, leaving out its timestamp
+        # header, so a repeated update is skipped even a second later
+        self._last_progress_hash = None
+        
+        # Title/body edits waiting to be sent as one PR update
+        self._pending_edits = {}
+        
+        # Use the REST API when httpx, a token and a GitHub origin are available;
+        # otherwise every operation falls back to the gh CLI
+        self.repo_slug = None
+        self._gh = None
+        if httpx is not None:
+            try:
+                match = _GITHUB_REMOTE_RE.search(self.repo.remotes.origin.url)
+            except (AttributeError, ValueError):
+                match = None
+            token = _github_token() if match else None
+            if token:
+                self.repo_slug = match.group(1)
+                self._gh = httpx.Client(
+                    base_url=GITHUB_API_URL,
+                    headers={
+                        'Authorization': f'token {token}',
+                        'Accept': 'application/vnd.github+json'
+                    },
+                    http2=HTTP2_AVAILABLE,
+                    timeout=30.0
+                )
+    
+    @classmethod
+    def warm_cache(cls, repo_path: str) -> int:
+        """
+        Look up every open PR in the repository with a single gh call.
+        
+        PRManagers created afterwards for a branch that already has an open
+        PR pick up its number and URL without another request. PRs opened
+        from forks are left out: their head branch only shares a name with
+        ours and must never be edited or commented on.
+        
+        Args:
+            repo_path: Path to the repository
+            
+        Returns:
+            Number of PRs cached
+        """
+        try:
+            returncode, out, err = _run_bin(["gh", "pr", "list", "--state", "open", "--limit", "200",
+                                             "--json", "number,url,headRefName,isCrossRepository"],
+                                            cwd=repo_path)
+        except OSError as e:
+            print(f"Warning: Could not list PRs: {e}")
+            return 0
+        if returncode != 0:
+            print(f"Warning: Could not list PRs: {err.decode('utf-8', errors='replace').strip()}")
+            return 0
+        
+        try:
+            found = {
+                _pr_cache_key(repo_path, pr['headRefName']): (str(pr['number']), pr['url'])
+                for pr in _json_loads(out)
+                if not pr['isCrossRepository']
+            }
+        except (ValueError, TypeError, KeyError) as e:
+            print(f"Warning: Could not parse PR list: {e}")
+            return 0
+        _PR_CACHE.update(found)
+        return len(found)
+    
+    def find_open_pr(self) -> bool:
+        """
+        Pick up an open PR for this branch, if there is one.
+        
+        With the REST client this is a single request filtered to our own
+        repository's branch; otherwise the open PRs are listed once with gh
+        (see warm_cache).
+        
+        Returns:
+            True if an open PR for this branch is known
+        """
+        if self.pr_number:
+            return True
+        
+        key = _pr_cache_key(self.repo_path, self.branch_name)
+        if self._gh is None:
+            self.warm_cache(self.repo_path)
+        else:
+            owner = self.repo_slug.split('/', 1)[0]
+            query = urllib.parse.urlencode({'state': 'open', 'head': f"{owner}:{self.branch_name}"})
+            try:
+                for pr in self._github_request("GET", f"/pulls?{query}"):
+                    if (pr['head']['repo'] or {}).get('full_name') == self.repo_slug:
+                        _PR_CACHE[key] = (str(pr['number']), pr['html_url'])
+                        break
+            except HTTP_ERRORS + (ValueError, TypeError, KeyError) as e:
+                print(f"Warning: Could not list PRs: {e}")
+        
+        self.pr_number, self.pr_url = _PR_CACHE.get(key, (None, None))
+        return self.pr_number is not None
+    
+    def _github_request(self, method: str, path: str, payload: dict = None) -> dict:
+        """
+        Send a request to the GitHub REST API for this repository.
+        
+        Args:
+            method: HTTP method
+            path: Path below /repos/{owner}/{repo}
+            payload: Optional JSON body
+            
+        Returns:
+            Decoded JSON response
+            
+        Raises:
+            httpx.HTTPError: If the request fails or returns an error status
+        """
+        response = self._gh.request(method, f"/repos/{self.repo_slug}{path}", json=payload)
+        response.raise_for_status()
+        return _json_loads(response.content)
+    
+    def _run_gh(self, args: list) -> bytes:
+        """
+        Run a gh CLI command in the repository.
+        
+        Args:
+            args: Arguments after "gh"
+            
+        Returns:
+            Raw stdout bytes
+            
+        Raises:
+            subprocess.CalledProcessError: If gh exits with a non-zero status
+        """
+        returncode, out, err = _run_bin(["gh", *args], cwd=self.repo_path)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, ["gh", *args], out, err)
+        return out
     
     def create_wip_pr(self, title: str, initial_body: str) -> bool:
         """
@@ -80,35 +339,108 @@ class PRManager:
         try:
             # Push the branch first
             print(f"Pushing branch {self.branch_name} to origin...")
-            self.repo.remote(name='origin').push(self.branch_name, set_upstream=True)
+            # (plain git push: GitPython's remote.push would parse every ref into PushInfo)
+            self.repo.git.push('-u', 'origin', self.branch_name)
+            
+            # Reuse an open PR for this branch instead of failing to create a second one
+            if self.pr_number:
+                print(f"Reusing open PR #{self.pr_number}: {wip_title}")
+                self.queue_edit(title=wip_title, body=initial_body)
+                return self.flush_edits()
             
             # Create the PR
             print(f"Creating WIP PR: {wip_title}")
-            result = subprocess.run(
-                ["gh", "pr", "create", 
-                 "--title", wip_title,
-                 "--body", initial_body],
-                cwd=self.repo_path,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            if self._gh is not None:
+                base = self._github_request("GET", "")["default_branch"]
+                pr = self._github_request("POST", "/pulls", {
+                    'title': wip_title,
+                    'body': initial_body,
+                    'head': self.branch_name,
+                    'base': base
+                })
+                self.pr_url = pr['html_url']
+                self.pr_number = str(pr['number'])
+                _PR_CACHE[_pr_cache_key(self.repo_path, self.branch_name)] = (self.pr_number, self.pr_url)
+                print(f"✅ Created WIP PR: {self.pr_url}")
+                return True
+            
+            out = self._run_gh(["pr", "create",
+                                "--title", wip_title,
+                                "--body", initial_body])
             
             # Extract PR URL from output
-            self.pr_url = result.stdout.strip()
+            self.pr_url = out.decode('utf-8', errors='replace').strip()
             
             # Extract PR number from URL
-            pr_match = re.search(r'/pull/(\d+)', self.pr_url)
+            pr_match = _PR_URL_RE.search(self.pr_url)
             if pr_match:
                 self.pr_number = pr_match.group(1)
+                _PR_CACHE[_pr_cache_key(self.repo_path, self.branch_name)] = (self.pr_number, self.pr_url)
             
             print(f"✅ Created WIP PR: {self.pr_url}")
             return True
             
         except subprocess.CalledProcessError as e:
             print(f"Error creating PR: {e}")
-            print(f"STDOUT: {e.stdout}")
-            print(f"STDERR: {e.stderr}")
+            print(f"STDOUT: {e.stdout.decode('utf-8', errors='replace')}")
+            print(f"STDERR: {e.stderr.decode('utf-8', errors='replace')}")
+            return False
+        except GitCommandError as e:
+            # e.g. the push was rejected because the remote branch has diverged
+            print(f"Error pushing branch {self.branch_name}: {e}")
+            return False
+        except HTTP_ERRORS as e:
+            print(f"Error creating PR: {e}")
+            return False
+    
+    def queue_edit(self, title: str = None, body: str = None):
+        """
+        Queue a PR title and/or body change for the next flush_edits().
+        
+        Later values for the same field replace earlier ones, so any number
+        of edits during a phase cost a single request.
+        
+        Args:
+            title: New PR title, or None to leave it unchanged
+            body: New PR body, or None to leave it unchanged
+        """
+        if title is not None:
+            self._pending_edits['title'] = title
+        if body is not None:
+            self._pending_edits['body'] = body
+    
+    def flush_edits(self) -> bool:
+        """
+        Send all queued PR edits as one API call or one `gh pr edit`.
+        
+        Returns:
+            True if successful (or nothing was queued), False otherwise
+        """
+        if not self._pending_edits:
+            return True
+        if not self.pr_number:
+            print("Warning: PR number not found, cannot update")
+            return False
+        
+        edits = self._pending_edits
+        self._pending_edits = {}
+        
+        if self._gh is not None:
+            try:
+                self._github_request("PATCH", f"/pulls/{self.pr_number}", edits)
+                return True
+            except HTTP_ERRORS as e:
+                print(f"Error updating PR: {e}")
+                return False
+        
+        args = ["pr", "edit", self.pr_number]
+        for field, value in edits.items():
+            args += [f"--{field}", value]
+        try:
+            self._run_gh(args)
+            return True
+        except subprocess.CalledProcessError as e:
+            print(f"Error updating PR: {e}")
             return False
     
     def update_pr_body(self, new_body: str) -> bool:
@@ -125,20 +457,11 @@ class PRManager:
             print("Warning: PR number not found, cannot update")
             return False
         
-        try:
-            subprocess.run(
-                ["gh", "pr", "edit", self.pr_number,
-                 "--body", new_body],
-                cwd=self.repo_path,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            print(f"✅ Updated PR #{self.pr_number} description")
-            return True
-        except subprocess.CalledProcessError as e:
-            print(f"Error updating PR: {e}")
+        self.queue_edit(body=new_body)
+        if not self.flush_edits():
             return False
+        print(f"✅ Updated PR #{self.pr_number} description")
+        return True
     
     def finalize_pr(self, final_title: str, final_body: str) -> bool:
         """
@@ -155,22 +478,16 @@ class PRManager:
             print("Warning: PR number not found, cannot finalize")
             return False
         
-        try:
-            subprocess.run(
-                ["gh", "pr", "edit", self.pr_number,
-                 "--title", final_title,
-                 "--body", final_body],
-                cwd=self.repo_path,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            self.is_wip = False
-            print(f"✅ Finalized PR #{self.pr_number}")
-            return True
-        except subprocess.CalledProcessError as e:
-            print(f"Error finalizing PR: {e}")
+        # Post any coalesced progress updates before the final edit
+        self.flush()
+        
+        # Folds in any edits still queued from earlier phases
+        self.queue_edit(title=final_title, body=final_body)
+        if not self.flush_edits():
             return False
+        self.is_wip = False
+        print(f"✅ Finalized PR #{self.pr_number}")
+        return True
     
     def commit_and_push(self, files: list, commit_message: str) -> bool:
         """
@@ -184,26 +501,23 @@ class PRManager:
             True if successful, False otherwise
         """
         try:
-            # Stage files
-            self.repo.index.add(files)
+            # Stage and commit with git itself: one pass over the index
+            # instead of GitPython's add/diff/commit round trips
+            self.repo.git.add('--', *files)
             
-            # Check if there are changes to commit
-            # Handle case where there's no HEAD yet (new repo)
-            try:
-                if not self.repo.index.diff("HEAD"):
-                    print("No changes to commit")
-                    return True
-            except Exception:
-                # No HEAD exists yet (new repo), proceed with commit
-                pass
+            # Exit status 0 means nothing is staged (locale-independent,
+            # unlike matching git's "nothing to commit" messages)
+            if self.repo.git.diff('--cached', '--quiet', with_extended_output=True,
+                                  with_exceptions=False)[0] == 0:
+                print("No changes to commit")
+                return True
             
-            # Commit
             print(f"Committing: {commit_message}")
-            self.repo.index.commit(commit_message)
+            self.repo.git.commit('-q', '-m', commit_message)
             
             # Push
             print(f"Pushing to {self.branch_name}...")
-            self.repo.remote(name='origin').push(self.branch_name)
+            self.repo.git.push('origin', self.branch_name)
             
             print("✅ Committed and pushed changes")
             return True
@@ -226,67 +540,137 @@ class PRManager:
             print("Warning: PR number not found, cannot add comment")
             return False
         
+        comment_hash = hashlib.blake2b(comment_body.encode('utf-8'), digest_size=8).digest()
+        if comment_hash == self._last_comment_hash:
+            return True
+        
+        if self._gh is not None:
+            try:
+                self._github_request("POST", f"/issues/{self.pr_number}/comments", {'body': comment_body})
+                self._last_comment_hash = comment_hash
+                print(f"✅ Added comment to PR #{self.pr_number}")
+                return True
+            except HTTP_ERRORS as e:
+                print(f"Error adding PR comment: {e}")
+                return False
+        
         try:
-            subprocess.run(
-                ["gh", "pr", "comment", self.pr_number,
-                 "--body", comment_body],
-                cwd=self.repo_path,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            self._run_gh(["pr", "comment", self.pr_number,
+                          "--body", comment_body])
+            self._last_comment_hash = comment_hash
             print(f"✅ Added comment to PR #{self.pr_number}")
             return True
         except subprocess.CalledProcessError as e:
             print(f"Error adding PR comment: {e}")
             return False
     
+    def flush(self, wait: bool = True) -> bool:
+        """
+        Post all pending progress updates as a single PR comment.
+        
+        Args:
+            wait: Block until every comment posted so far has been sent
+            
+        Returns:
+            True if successful (or nothing was pending), False otherwise.
+            Always True when wait is False.
+        """
+        with self._progress_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            
+            if self._pending_progress:
+                comment_body = "\n---\n\n".join(self._pending_progress)
+                if self._comment_worker is None:
+                    self._comment_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pr-comments")
+                try:
+                    self._comment_futures.append(self._comment_worker.submit(self.add_pr_comment, comment_body))
+                except RuntimeError:
+                    # No new work is accepted once the interpreter is shutting
+                    # down (e.g. the coalescing timer fired late): post here
+                    self.add_pr_comment(comment_body)
+                self._pending_progress = []
+                self._last_flush = time.monotonic()
+            
+            if not wait:
+                return True
+            futures, self._comment_futures = self._comment_futures, []
+        return all([future.result() for future in futures])
+    
+    def _flush_at_exit(self):
+        """Post still-queued progress updates when the process exits (e.g. sys.exit)."""
+        with self._progress_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            pending, self._pending_progress = self._pending_progress, []
+        # The comment worker is already shut down by now, so post directly
+        if pending:
+            self.add_pr_comment("\n---\n\n".join(pending))
+    
     def update_progress(self, phase: str, description: str, details: dict = None) -> bool:
         """
         Update PR progress by adding a timestamped comment.
         This preserves the original PR description and creates a history.
         
+        Updates arriving within PROGRESS_MIN_INTERVAL seconds of the last
+        posted comment are queued and posted together once the interval runs
+        out, on the next update, or by flush()/finalize_pr(), whichever comes
+        first; anything still queued is posted at exit. Comments are sent in
+        the background; flush() waits for them.
+        
         Args:
             phase: Current phase name
             description: Description of current work
             details: Optional dictionary with additional details (files, results, etc.)
             
         Returns:
-            True if successful, False otherwise
+            True once the update is queued (or skipped as a repeat of the last one)
         """
-        import datetime
-        
         # Build progress comment with timestamp
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        progress_comment = f"""## 🚧 Progress Update - {timestamp}
-
-### Phase: {phase}
-
-{description}
-"""
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        parts = [f"## 🚧 Progress Update - {timestamp}\n\n### Phase: {phase}\n\n{description}\n"]
         
         # Add details if provided
         if details:
             # Format file lists using helper function
             if 'files_modified' in details and details['files_modified']:
-                progress_comment += format_file_list(details['files_modified'], "Files Modified")
+                parts.append(format_file_list(details['files_modified'], "Files Modified"))
             
             if 'files_created' in details and details['files_created']:
-                progress_comment += format_file_list(details['files_created'], "Files Created")
+                parts.append(format_file_list(details['files_created'], "Files Created"))
             
             if 'test_status' in details:
-                progress_comment += f"\n**Test Status:** {details['test_status']}\n"
+                parts.append(f"\n**Test Status:** {details['test_status']}\n")
             
             if 'review_status' in details:
-                progress_comment += f"\n**Review Status:** {details['review_status']}\n"
+                parts.append(f"\n**Review Status:** {details['review_status']}\n")
             
             if 'iteration' in details:
-                progress_comment += f"\n**Iteration:** {details['iteration']}\n"
+                parts.append(f"\n**Iteration:** {details['iteration']}\n")
             
             if 'message' in details:
-                progress_comment += f"\n{details['message']}\n"
+                parts.append(f"\n{details['message']}\n")
         
-        return self.add_pr_comment(progress_comment)
+        progress_comment = "".join(parts)
+        progress_hash = hashlib.blake2b(
+            "\0".join([phase, description, *parts[1:]]).encode('utf-8'), digest_size=8
+        ).digest()
+        with self._progress_lock:
+            if progress_hash == self._last_progress_hash:
+                return True
+            self._last_progress_hash = progress_hash
+            self._pending_progress.append(progress_comment)
+            remaining = self._min_interval - (time.monotonic() - self._last_flush)
+            if remaining > 0:
+                # Too soon after the last comment: post when the interval runs out
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(remaining, self.flush, kwargs={'wait': False})
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return True
+        return self.flush(wait=False)
 
 
 def parse_pr_content(llm_response: str) -> Dict[str, str]:
@@ -301,31 +685,31 @@ def parse_pr_content(llm_response: str) -> Dict[str, str]:
     Returns:
         Dictionary with commit_message, pr_title, and pr_body
     """
-    # Try to extract and parse JSON more carefully
-    try:
-        # Look for the first complete JSON object
-        start_idx = llm_response.find('{')
-        if start_idx != -1:
-            # Find matching closing brace using a simple counter
-            brace_count = 0
-            end_idx = -1
-            for i in range(start_idx, len(llm_response)):
-                if llm_response[i] == '{':
-                    brace_count += 1
-                elif llm_response[i] == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        end_idx = i + 1
-                        break
-            
-            if end_idx != -1:
-                json_str = llm_response[start_idx:end_idx]
-                data = json.loads(json_str)
-                # Validate required fields
-                if 'commit_message' in data and 'pr_title' in data and 'pr_body' in data:
-                    return data
-    except (json.JSONDecodeError, ValueError):
-        pass
+    required_fields = {'commit_message', 'pr_title', 'pr_body'}
+    
+    # Fast path: the model usually replies with nothing but the JSON object
+    stripped = llm_response.strip()
+    if orjson is not None and stripped.startswith('{') and stripped.endswith('}'):
+        try:
+            data = orjson.loads(stripped)
+            if isinstance(data, dict) and required_fields <= data.keys():
+                return data
+        except orjson.JSONDecodeError:
+            pass
+    
+    # Let the C JSON scanner find the object boundary: try each '{' in turn
+    # and decode the first complete JSON value starting there
+    decoder = json.JSONDecoder()
+    start_idx = llm_response.find('{')
+    while start_idx != -1:
+        try:
+            data, _ = decoder.raw_decode(llm_response, start_idx)
+            # Validate required fields
+            if isinstance(data, dict) and required_fields <= data.keys():
+                return data
+        except json.JSONDecodeError:
+            pass
+        start_idx = llm_response.find('{', start_idx + 1)
     
     # Fallback: use the entire response as PR body
     print("Warning: Could not parse JSON from LLM response, using fallback")
@@ -6,15 +6,38 @@ to prevent LLM confusion or crashes due to excessive input.
 """
 
 import logging
+import os
 from typing import List, Dict, Any
 
+# Optional: exact BPE token counts (encoded in Rust) instead of the
+# characters-per-token estimate
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# tiktoken encoding used for counting when tiktoken is installed
+TOKEN_ENCODING = "cl100k_base"
+
+# Separator used when several contexts are counted as one block of text
+CONTEXT_SEPARATOR = '\n\n'
+
+
+def _joined_length(texts: List[str]) -> int:
+    """Length of CONTEXT_SEPARATOR.join(texts), without building the string."""
+    if not texts:
+        return 0
+    return sum(map(len, texts)) + len(CONTEXT_SEPARATOR) * (len(texts) - 1)
+
 
 class TokenManager:
     """Manages token counts and context truncation."""
     
+    __slots__ = ('max_tokens', 'token_budget', 'encoding')
+    
     # Approximate tokens per character (rough estimate)
     # Most LLMs average ~4 characters per token
     CHARS_PER_TOKEN = 4
@@ -32,6 +55,15 @@ class TokenManager:
             'file_content': max_tokens // 2,      # 50% for file content
             'other': max_tokens // 4              # 25% for prompts and other
         }
+        
+        # Fall back to the character heuristic if the encoding can't be loaded
+        # (e.g. no network to fetch it on first use)
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+            except Exception as e:
+                logger.warning(f"Could not load tiktoken encoding {TOKEN_ENCODING}: {e}")
     
     def estimate_tokens(self, text: str) -> int:
         """
@@ -45,8 +77,46 @@ class TokenManager:
         """
         if not text:
             return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
         return len(text) // self.CHARS_PER_TOKEN
     
+    def estimate_tokens_batch(self, texts: List[str]) -> List[int]:
+        """
+        Estimate the number of tokens in each of several texts.
+        
+        With tiktoken the texts are encoded in parallel threads.
+        
+        Args:
+            texts: The texts to estimate
+            
+        Returns:
+            Estimated token count for each text
+        """
+        if self.encoding is not None and texts:
+            encoded = self.encoding.encode_batch(texts, num_threads=os.cpu_count() or 1,
+                                                 disallowed_special=())
+            return [len(tokens) for tokens in encoded]
+        return [len(text) // self.CHARS_PER_TOKEN for text in texts]
+    
+    def estimate_tokens_many(self, texts: List[str]) -> int:
+        """
+        Estimate the number of tokens in several texts counted as one.
+        
+        Same result as estimate_tokens on the texts joined with blank lines,
+        but without allocating the joined string.
+        
+        Args:
+            texts: The texts to estimate
+            
+        Returns:
+            Estimated token count
+        """
+        if self.encoding is not None and texts:
+            # Each blank-line separator is a single token
+            return sum(self.estimate_tokens_batch(texts)) + len(texts) - 1
+        return _joined_length(texts) // self.CHARS_PER_TOKEN
+    
     def truncate_to_token_limit(self, text: str, max_tokens: int) -> str:
         """
         Truncate text to fit within a token limit.
@@ -58,14 +128,23 @@ class TokenManager:
         Returns:
             Truncated text with ellipsis if truncated
         """
-        estimated_tokens = self.estimate_tokens(text)
-        
-        if estimated_tokens <= max_tokens:
-            return text
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            truncated = self.encoding.decode(tokens[:max_tokens])
+            return truncated + f"\n\n... [Truncated. Original length: {len(text)} chars, {len(tokens)} tokens]"
         
         # Calculate target character count
         target_chars = max_tokens * self.CHARS_PER_TOKEN
         
+        if len(text) <= target_chars:
+            return text
+        
+        estimated_tokens = self.estimate_tokens(text)
+        if estimated_tokens <= max_tokens:
+            return text
+        
         # Truncate and add ellipsis
         truncated = text[:target_chars]
         return truncated + f"\n\n... [Truncated. Original length: {len(text)} chars, ~{estimated_tokens} tokens]"
@@ -86,8 +165,7 @@ class TokenManager:
             return []
         
         # Calculate total tokens
-        total_text = '\n\n'.join(exploration_log)
-        total_tokens = self.estimate_tokens(total_text)
+        total_tokens = self.estimate_tokens_many(exploration_log)
         
         if total_tokens <= self.token_budget['exploration_log']:
             return exploration_log
@@ -120,22 +198,38 @@ class TokenManager:
         if not file_contents:
             return {}
         
-        # Calculate total tokens
-        total_text = '\n\n'.join(file_contents.values())
-        total_tokens = self.estimate_tokens(total_text)
+        # Count each file once; the total is derived from the per-file counts
+        # (as in estimate_tokens_many) rather than encoding everything again
+        file_tokens = dict(zip(file_contents, self.estimate_tokens_batch(list(file_contents.values()))))
+        if self.encoding is not None:
+            # Each blank-line separator is a single token
+            total_tokens = sum(file_tokens.values()) + len(file_tokens) - 1
+        else:
+            total_tokens = _joined_length(list(file_contents.values())) // self.CHARS_PER_TOKEN
         
         if total_tokens <= max_tokens:
             return file_contents
         
-        # Distribute tokens evenly across files
-        tokens_per_file = max_tokens // len(file_contents)
+        # Hand out the budget smallest file first: each file gets at most an
+        # equal share of what's left, so small files stay whole and the
+        # large ones split the remainder
+        allowance = {}
+        remaining = max_tokens
+        files_left = len(file_contents)
+        for filename in sorted(file_contents, key=file_tokens.get):
+            allowance[filename] = min(file_tokens[filename], remaining // files_left)
+            remaining -= allowance[filename]
+            files_left -= 1
         
         truncated_contents = {}
         for filename, content in file_contents.items():
-            truncated_contents[filename] = self.truncate_to_token_limit(
-                content, 
-                tokens_per_file
-            )
+            if file_tokens[filename] <= allowance[filename]:
+                truncated_contents[filename] = content
+            else:
+                truncated_contents[filename] = self.truncate_to_token_limit(
+                    content, 
+                    allowance[filename]
+                )
         
         return truncated_contents
     
@@ -158,16 +252,21 @@ class TokenManager:
         total_tokens = 0
         for name, text in contexts.items():
             if isinstance(text, list):
-                text = '\n\n'.join(str(item) for item in text)
-            elif not isinstance(text, str):
-                text = str(text)
+                # Count list entries as if joined, without joining them
+                parts = [str(item) for item in text]
+                chars = _joined_length(parts)
+                tokens = self.estimate_tokens_many(parts)
+            else:
+                if not isinstance(text, str):
+                    text = str(text)
+                chars = len(text)
+                tokens = self.estimate_tokens(text)
             
-            tokens = self.estimate_tokens(text)
             total_tokens += tokens
             
             stats['contexts'][name] = {
                 'tokens': tokens,
-                'chars': len(text),
+                'chars': chars,
                 'percentage': round(tokens / self.max_tokens * 100, 1)
             }
         
@@ -234,8 +333,9 @@ class TokenManager:
                 else:
                     truncated[name] = text
         
-        # Verify we're now within budget
-        final_stats = self.get_context_stats(**truncated)
-        logger.info(f"Reduced to {final_stats['total_tokens']} tokens ({final_stats['total_percentage']}%)")
+        # Report the new size (re-measuring is only worth it if someone will see it)
+        if logger.isEnabledFor(logging.INFO):
+            final_stats = self.get_context_stats(**truncated)
+            logger.info(f"Reduced to {final_stats['total_tokens']} tokens ({final_stats['total_percentage']}%)")
         
         return truncated
@@ -5,11 +5,105 @@ This module provides tools that the agent can use to explore the codebase
 dynamically, similar to how a human developer would investigate an issue.
 """
 
+import functools
+import io
+import json
+import logging
+import mmap
 import os
 import re
+import shutil
 import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import translate
+from itertools import islice
 from typing import List, Dict, Optional, Tuple, Any
 
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Directories left out of file listings and fallback searches
+SKIP_DIRS = frozenset({
+    '.git', '__pycache__', 'node_modules',
+    '.venv', 'venv', '.tox', '.mypy_cache', '.pytest_cache'
+})
+
+# Files with a NUL byte in this many leading bytes are treated as binary
+BINARY_SNIFF_BYTES = 8192
+
+# Matches returned to the agent per search; it only ever shows the first few
+SEARCH_MAX_RESULTS = 50
+
+# File contents kept in memory for repeated read_file/get_file_info calls;
+# larger files are read each time rather than cached
+FILE_CACHE_MAX_ENTRIES = 128
+FILE_CACHE_MAX_BYTES = 1024 * 1024
+
+
+@functools.lru_cache(maxsize=512)
+def _word_pattern(symbol: str) -> str:
+    """Regex matching symbol as a whole word."""
+    return r'\b' + re.escape(symbol) + r'\b'
+
+
+@functools.lru_cache(maxsize=128)
+def _glob_regex(glob: str) -> re.Pattern:
+    """Translate a filename glob (e.g. "*.py") to a compiled regex once."""
+    return re.compile(translate(glob))
+
+
+@functools.lru_cache(maxsize=512)
+def _compiled_pattern(query: str, case_sensitive: bool) -> re.Pattern:
+    """Compile a search query, for whole-file bytes search, once per (query, case_sensitive) pair."""
+    return re.compile(query.encode('utf-8'), re.MULTILINE | (0 if case_sensitive else re.IGNORECASE))
+
+
+def _scan_file(repo_path: str, rel_path: str, pattern: re.Pattern, max_results: int = None) -> List[Dict[str, Any]]:
+    """
+    Search one file for a compiled bytes pattern.
+    
+    The file is memory-mapped and searched as a whole; line numbers are only
+    worked out for lines that match. Binary and unreadable files yield nothing.
+    """
+    matches = []
+    try:
+        with open(os.path.join(repo_path, rel_path), 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm.find(b'\0', 0, BINARY_SNIFF_BYTES) != -1:
+                    return matches
+                
+                line_num = 1
+                counted_to = 0
+                pos = 0
+                while True:
+                    match = pattern.search(mm, pos)
+                    if match is None:
+                        break
+                    start = match.start()
+                    line_num += mm[counted_to:start].count(b'\n')
+                    line_start = mm.rfind(b'\n', 0, start) + 1
+                    line_end = mm.find(b'\n', start)
+                    if line_end == -1:
+                        line_end = len(mm)
+                    matches.append({
+                        'file_path': rel_path,
+                        'line_number': line_num,
+                        'content': mm[line_start:line_end].decode('utf-8', errors='replace').rstrip()
+                    })
+                    if max_results and len(matches) >= max_results:
+                        break
+                    # One result per line, like grep
+                    counted_to = start
+                    pos = line_end + 1
+                    if pos > len(mm):
+                        break
+    except (OSError, ValueError):
+        # ValueError: empty files can't be mapped
+        pass
+    return matches
+
 
 class CodebaseTools:
     """Tools for exploring and searching the codebase."""
@@ -22,8 +116,30 @@ class CodebaseTools:
             repo_path: Path to the repository
         """
         self.repo_path = repo_path
+        
+        # Paths under the repo as reported by scandir/grep/rg start with this,
+        # so stripping it is enough to make them relative
+        self._repo_prefix = os.path.join(repo_path, '')
+        
+        # Prefer ripgrep (parallel walk, structured output) when it's installed
+        self._rg = shutil.which("rg")
+        
+        # Relative paths of every file in the repo, walked once and reused
+        # until any walked directory's mtime changes (see _index_files)
+        self._file_index = None
+        self._dir_mtimes = {}
+        
+        # Recently read files: full path -> [(mtime_ns, size), content, lines or None]
+        self._file_cache = OrderedDict()
     
-    def search_code(self, query: str, file_pattern: str = None, case_sensitive: bool = False) -> List[Dict[str, Any]]:
+    def _relative(self, path: str) -> str:
+        """Make a path produced by searching under repo_path relative to it."""
+        if path.startswith(self._repo_prefix):
+            return path[len(self._repo_prefix):]
+        return os.path.relpath(path, self.repo_path)
+    
+    def search_code(self, query: str, file_pattern: str = None, case_sensitive: bool = False,
+                    max_results: int = None, word_match: bool = False) -> List[Dict[str, Any]]:
         """
         Search for a string or pattern in the codebase using grep.
         
@@ -31,10 +147,15 @@ class CodebaseTools:
             query: The string or regex pattern to search for
             file_pattern: Optional file pattern (e.g., "*.py")
             case_sensitive: Whether search should be case-sensitive
+            max_results: Stop searching after this many matches (default: no limit)
+            word_match: Treat query as a literal that must match a whole word
             
         Returns:
             List of matches with file path, line number, and content
         """
+        if self._rg:
+            return self._search_code_rg(query, file_pattern, case_sensitive, max_results, word_match)
+        
         matches = []
         
         try:
@@ -42,9 +163,15 @@ class CodebaseTools:
             cmd = ["grep", "-rn"]
             if not case_sensitive:
                 cmd.append("-i")
+            if word_match:
+                cmd.extend(["-F", "-w"])
+            
+            # No file can contribute more than the overall limit
+            if max_results:
+                cmd.extend(["-m", str(max_results)])
             
             # Add pattern
-            cmd.append(query)
+            cmd.extend(["-e", query])
             
             # Add file pattern if specified
             if file_pattern:
@@ -66,75 +193,230 @@ class CodebaseTools:
                 # Format: filepath:line_number:content
                 parts = line.split(':', 2)
                 if len(parts) >= 3:
-                    file_path = os.path.relpath(parts[0], self.repo_path)
-                    line_num = parts[1]
-                    content = parts[2]
+                    file_path = self._relative(parts[0])
+                    try:
+                        line_num = int(parts[1])
+                    except ValueError:
+                        line_num = 0
                     
+                    # Keep leading indentation: it shows the agent where the match sits
                     matches.append({
                         'file_path': file_path,
-                        'line_number': int(line_num) if line_num.isdigit() else 0,
-                        'content': content.strip()
+                        'line_number': line_num,
+                        'content': parts[2].rstrip()
                     })
+                    if max_results and len(matches) >= max_results:
+                        break
             
         except subprocess.TimeoutExpired:
-            print("Warning: search_code timed out")
+            logger.warning("search_code timed out")
         except FileNotFoundError:
             # grep not available, fall back to Python implementation
-            matches = self._search_code_fallback(query, file_pattern, case_sensitive)
+            matches = self._search_code_fallback(query, file_pattern, case_sensitive, max_results, word_match)
         except Exception as e:
-            print(f"Warning: search_code failed: {e}")
+            logger.warning("search_code failed: %s", e)
         
         return matches
     
-    def _search_code_fallback(self, query: str, file_pattern: str = None, case_sensitive: bool = False) -> List[Dict[str, Any]]:
-        """Fallback Python implementation of code search."""
+    def _search_code_rg(self, query: str, file_pattern: str = None, case_sensitive: bool = False,
+                        max_results: int = None, word_match: bool = False) -> List[Dict[str, Any]]:
+        """
+        Search with ripgrep, parsing its JSON output as it streams in.
+        
+        Unlike grep -r, ripgrep skips files ignored by .gitignore and hidden
+        directories such as .git.
+        """
         matches = []
-        pattern = re.compile(query if case_sensitive else query, re.IGNORECASE if not case_sensitive else 0)
         
-        for root, _, files in os.walk(self.repo_path):
-            # Skip .git directory
-            if '.git' in root:
-                continue
-            
-            for filename in files:
-                # Check file pattern if specified
-                if file_pattern:
-                    import fnmatch
-                    if not fnmatch.fnmatch(filename, file_pattern):
-                        continue
-                
-                file_path = os.path.join(root, filename)
-                rel_path = os.path.relpath(file_path, self.repo_path)
-                
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        for line_num, line in enumerate(f, 1):
-                            if pattern.search(line):
-                                matches.append({
-                                    'file_path': rel_path,
-                                    'line_number': line_num,
-                                    'content': line.strip()
-                                })
-                except (UnicodeDecodeError, PermissionError):
+        cmd = [self._rg, "--json", "-n", "--no-messages"]
+        if not case_sensitive:
+            cmd.append("-i")
+        if word_match:
+            cmd.extend(["-F", "-w"])
+        if file_pattern:
+            cmd.extend(["-g", file_pattern])
+        if max_results:
+            cmd.extend(["-m", str(max_results)])
+        cmd.extend(["-e", query, self.repo_path])
+        
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                    text=True, encoding='utf-8', errors='replace')
+        except OSError as e:
+            logger.warning("search_code failed: %s", e)
+            return matches
+        
+        timer = threading.Timer(30, proc.kill)
+        timer.start()
+        try:
+            for raw in proc.stdout:
+                record = json.loads(raw)
+                if record.get('type') != 'match':
+                    continue
+                data = record['data']
+                # Non-UTF-8 paths/lines come back base64-encoded under "bytes"
+                path = data['path'].get('text')
+                line = data['lines'].get('text')
+                if path is None or line is None:
                     continue
+                matches.append({
+                    'file_path': self._relative(path),
+                    'line_number': data.get('line_number') or 0,
+                    'content': line.rstrip()
+                })
+                if max_results and len(matches) >= max_results:
+                    # Enough matches: stop rg instead of reading the rest
+                    proc.kill()
+                    break
+        except ValueError as e:
+            logger.warning("search_code failed: %s", e)
+        finally:
+            proc.stdout.close()
+            proc.wait()
+            if not timer.is_alive():
+                logger.warning("search_code timed out")
+            timer.cancel()
         
         return matches
     
-    def find_references(self, symbol: str, file_pattern: str = None) -> List[Dict[str, Any]]:
+    def _index_files(self) -> List[str]:
+        """
+        Return the relative paths of all files in the repository.
+        
+        The tree is walked once with os.scandir, skipping SKIP_DIRS. The result
+        is reused until a walked directory's mtime changes (a file was added,
+        removed or renamed anywhere in the tree) or invalidate_index() is called.
+        Checking costs one stat per directory instead of a full walk.
+        """
+        if self._file_index is not None and self._index_is_current():
+            return self._file_index
+        
+        prefix_len = len(self._repo_prefix)
+        files = []
+        dir_mtimes = {}
+        stack = [self.repo_path]
+        while stack:
+            dir_path = stack.pop()
+            try:
+                # Stat before listing so a change made during the walk still shows up later
+                dir_mtimes[dir_path] = os.stat(dir_path).st_mtime_ns
+                with os.scandir(dir_path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in SKIP_DIRS:
+                                stack.append(entry.path)
+                        elif entry.is_file():
+                            files.append(entry.path[prefix_len:])
+            except OSError:
+                continue
+        
+        files.sort()
+        self._file_index = files
+        self._dir_mtimes = dir_mtimes
+        return files
+    
+    def _index_is_current(self) -> bool:
+        """Whether no directory walked for the file index has changed since."""
+        try:
+            return all(os.stat(dir_path).st_mtime_ns == mtime
+                       for dir_path, mtime in self._dir_mtimes.items())
+        except OSError:
+            return False
+    
+    def invalidate_index(self):
+        """Forget the cached file list, e.g. after files were added or removed."""
+        self._file_index = None
+    
+    def _search_code_fallback(self, query: str, file_pattern: str = None, case_sensitive: bool = False,
+                              max_results: int = None, word_match: bool = False) -> List[Dict[str, Any]]:
+        """Fallback Python implementation of code search (see _scan_file)."""
+        matches = []
+        pattern = _compiled_pattern(_word_pattern(query) if word_match else query, case_sensitive)
+        
+        glob_re = _glob_regex(file_pattern) if file_pattern else None
+        candidates = [
+            rel_path for rel_path in self._index_files()
+            if glob_re is None or glob_re.match(os.path.basename(rel_path))
+        ]
+        
+        # Files are scanned on a thread pool so reads and page faults overlap;
+        # results are still collected in index order
+        executor = ThreadPoolExecutor()
+        try:
+            results = executor.map(
+                lambda rel_path: _scan_file(self.repo_path, rel_path, pattern, max_results),
+                candidates
+            )
+            for file_matches in results:
+                matches.extend(file_matches)
+                if max_results and len(matches) >= max_results:
+                    del matches[max_results:]
+                    break
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        
+        return matches
+    
+    def find_references(self, symbol: str, file_pattern: str = None, max_results: int = None) -> List[Dict[str, Any]]:
         """
         Find references to a symbol (function, class, variable) in the codebase.
         
         Args:
             symbol: The symbol name to find
             file_pattern: Optional file pattern (e.g., "*.py")
+            max_results: Stop searching after this many references (default: no limit)
             
         Returns:
             List of references with file path, line number, and content
         """
-        # Search for the symbol as a whole word
-        # Using word boundaries to avoid partial matches
-        query = r'\b' + re.escape(symbol) + r'\b'
-        return self.search_code(query, file_pattern, case_sensitive=True)
+        # Search for the symbol as a whole word, as a fixed string: grep/rg
+        # match literal words without building a regex
+        return self.search_code(symbol, file_pattern, case_sensitive=True,
+                                max_results=max_results, word_match=True)
+    
+    def _read_cached(self, full_path: str) -> Tuple[str, os.stat_result]:
+        """
+        Read a file as UTF-8 text, reusing the cached copy while it's unchanged.
+        
+        Cache entries are checked against the file's mtime and size and
+        evicted least-recently-used first.
+        
+        Returns:
+            Tuple of (content, stat result)
+            
+        Raises:
+            OSError, UnicodeDecodeError: If the file can't be read
+        """
+        stat = os.stat(full_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        entry = self._file_cache.get(full_path)
+        if entry is not None and entry[0] == signature:
+            self._file_cache.move_to_end(full_path)
+            return entry[1], stat
+        
+        with open(full_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        
+        if stat.st_size <= FILE_CACHE_MAX_BYTES:
+            self._file_cache[full_path] = [signature, content, None]
+            self._file_cache.move_to_end(full_path)
+            while len(self._file_cache) > FILE_CACHE_MAX_ENTRIES:
+                self._file_cache.popitem(last=False)
+        else:
+            self._file_cache.pop(full_path, None)
+        return content, stat
+    
+    def _read_lines_cached(self, full_path: str) -> List[str]:
+        """Return a file's lines (with line endings), cached alongside its content."""
+        content, _ = self._read_cached(full_path)
+        entry = self._file_cache.get(full_path)
+        if entry is not None and entry[2] is not None:
+            return entry[2]
+        # StringIO splits on '\n' only, exactly like readlines() on the file
+        lines = io.StringIO(content).readlines()
+        if entry is not None:
+            entry[2] = lines
+        return lines
     
     def read_file(self, file_path: str, start_line: int = None, end_line: int = None) -> Optional[str]:
         """
@@ -151,21 +433,27 @@ class CodebaseTools:
         full_path = os.path.join(self.repo_path, file_path)
         
         try:
-            with open(full_path, 'r', encoding='utf-8') as f:
-                if start_line is None and end_line is None:
-                    return f.read()
-                
-                # Read specific lines
-                lines = f.readlines()
-                start_idx = (start_line - 1) if start_line else 0
-                end_idx = end_line if end_line else len(lines)
-                
-                return ''.join(lines[start_idx:end_idx])
+            if start_line is None and end_line is None:
+                return self._read_cached(full_path)[0]
+            
+            # Read specific lines
+            start_idx = (start_line - 1) if start_line else 0
+            
+            # Too big to cache: stream just the lines up to end_line
+            if (os.path.getsize(full_path) > FILE_CACHE_MAX_BYTES
+                    and start_idx >= 0 and (end_line or 0) >= 0):
+                with open(full_path, 'r', encoding='utf-8') as f:
+                    return ''.join(islice(f, start_idx, end_line or None))
+            
+            lines = self._read_lines_cached(full_path)
+            end_idx = end_line if end_line else len(lines)
+            
+            return ''.join(lines[start_idx:end_idx])
         except FileNotFoundError:
-            print(f"Warning: File not found: {file_path}")
+            logger.warning("File not found: %s", file_path)
             return None
         except Exception as e:
-            print(f"Warning: Could not read {file_path}: {e}")
+            logger.warning("Could not read %s: %s", file_path, e)
             return None
     
     def list_files(self, directory: str = "", pattern: str = None) -> List[str]:
@@ -179,26 +467,21 @@ class CodebaseTools:
         Returns:
             List of file paths
         """
-        dir_path = os.path.join(self.repo_path, directory)
         files = []
         
         try:
-            for root, _, filenames in os.walk(dir_path):
-                # Skip .git
-                if '.git' in root:
+            # Filter the cached file index instead of walking the tree again
+            prefix = os.path.normpath(directory) if directory else '.'
+            prefix = '' if prefix == '.' else prefix + os.sep
+            glob_re = _glob_regex(pattern) if pattern else None
+            for rel_path in self._index_files():
+                if not rel_path.startswith(prefix):
                     continue
-                
-                for filename in filenames:
-                    if pattern:
-                        import fnmatch
-                        if not fnmatch.fnmatch(filename, pattern):
-                            continue
-                    
-                    file_path = os.path.join(root, filename)
-                    rel_path = os.path.relpath(file_path, self.repo_path)
-                    files.append(rel_path)
+                if glob_re is not None and not glob_re.match(os.path.basename(rel_path)):
+                    continue
+                files.append(rel_path)
         except Exception as e:
-            print(f"Warning: Could not list files in {directory}: {e}")
+            logger.warning("Could not list files in %s: %s", directory, e)
         
         return files
     
@@ -215,20 +498,17 @@ class CodebaseTools:
         full_path = os.path.join(self.repo_path, file_path)
         
         try:
-            stat = os.stat(full_path)
-            
-            with open(full_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                lines = content.split('\n')
+            content, stat = self._read_cached(full_path)
             
             return {
                 'file_path': file_path,
                 'size_bytes': stat.st_size,
-                'line_count': len(lines),
+                # A trailing newline ends the last line rather than starting a new one
+                'line_count': content.count('\n') + (0 if not content or content.endswith('\n') else 1),
                 'char_count': len(content)
             }
         except Exception as e:
-            print(f"Warning: Could not get info for {file_path}: {e}")
+            logger.warning("Could not get info for %s: %s", file_path, e)
             return None
 
 
@@ -243,6 +523,18 @@ class ToolExecutor:
             tools: CodebaseTools instance
         """
         self.tools = tools
+        
+        # Tool name -> callable; searches are capped unless the caller sets max_results
+        self._dispatch = {
+            "search_code": functools.partial(tools.search_code, max_results=SEARCH_MAX_RESULTS),
+            "find_references": functools.partial(tools.find_references, max_results=SEARCH_MAX_RESULTS),
+            "read_file": tools.read_file,
+            "list_files": tools.list_files,
+            "get_file_info": tools.get_file_info,
+        }
+        
+        # One small record per call; results themselves aren't kept, since a
+        # long exploration would otherwise hold every search and file read
         self.execution_history = []
     
     def execute_tool(self, tool_name: str, **kwargs) -> Tuple[bool, Any]:
@@ -256,33 +548,64 @@ class ToolExecutor:
         Returns:
             Tuple of (success, result)
         """
+        tool = self._dispatch.get(tool_name)
+        if tool is None:
+            return False, f"Unknown tool: {tool_name}"
+        
         try:
-            if tool_name == "search_code":
-                result = self.tools.search_code(**kwargs)
-            elif tool_name == "find_references":
-                result = self.tools.find_references(**kwargs)
-            elif tool_name == "read_file":
-                result = self.tools.read_file(**kwargs)
-            elif tool_name == "list_files":
-                result = self.tools.list_files(**kwargs)
-            elif tool_name == "get_file_info":
-                result = self.tools.get_file_info(**kwargs)
-            else:
-                return False, f"Unknown tool: {tool_name}"
+            result = tool(**kwargs)
             
             # Record execution
             self.execution_history.append({
                 'tool': tool_name,
                 'args': kwargs,
-                'result': result
+                'result_size': len(result) if hasattr(result, '__len__') else int(result is not None)
             })
             
             return True, result
         except Exception as e:
             error_msg = f"Tool execution failed: {e}"
-            print(f"Warning: {error_msg}")
+            logger.warning("%s", error_msg)
             return False, error_msg
     
+    def execute_batch(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[bool, Any]]:
+        """
+        Execute several tool calls, running each distinct call only once.
+        
+        Repeated calls (same tool and arguments) share one result, and all
+        calls share the tools' file index and file content cache.
+        
+        Args:
+            calls: List of (tool_name, kwargs) pairs
+        
+        Returns:
+            List of (success, result) tuples, in the same order as calls
+        """
+        results = []
+        seen = {}
+        for tool_name, kwargs in calls:
+            key = (tool_name, repr(sorted(kwargs.items())))
+            if key not in seen:
+                seen[key] = self.execute_tool(tool_name, **kwargs)
+            results.append(seen[key])
+        return results
+    
+    def result_cap(self, tool_name: str, kwargs: Dict[str, Any]) -> Optional[int]:
+        """
+        The most results a call of tool_name with kwargs can return.
+        
+        Args:
+            tool_name: Name of the tool
+            kwargs: Arguments the tool was called with
+            
+        Returns:
+            The max_results limit in effect, or None if the tool is uncapped
+        """
+        tool = self._dispatch.get(tool_name)
+        if not isinstance(tool, functools.partial):
+            return None
+        return kwargs.get('max_results', tool.keywords.get('max_results'))
+    
     def get_execution_summary(self) -> str:
         """Get a summary of all tool executions."""
         summary = []
@@ -290,13 +613,15 @@ class ToolExecutor:
             summary.append(f"{i}. {execution['tool']}({execution['args']})")
         return '\n'.join(summary)
     
-    def format_tool_result(self, result: Any, max_items: int = 10) -> str:
+    def format_tool_result(self, result: Any, max_items: int = 10, result_cap: int = None) -> str:
         """
         Format tool result for display to LLM.
         
         Args:
             result: The tool result
             max_items: Maximum number of items to include in formatted output
+            result_cap: Limit the tool stopped at (see result_cap()), so a
+                list that reached it is reported as possibly incomplete
             
         Returns:
             Formatted string
@@ -322,7 +647,10 @@ class ToolExecutor:
                     formatted.append(str(item))
             
             output = '\n'.join(formatted)
-            if len(result) > max_items:
+            if result_cap and len(result) >= result_cap:
+                # The search stopped at the cap; the true count is unknown
+                output += f"\n... ({len(result) - max_items}+ more results, capped at {result_cap})"
+            elif len(result) > max_items:
                 output += f"\n... ({len(result) - max_items} more results)"
             
             return output